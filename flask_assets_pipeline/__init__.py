@@ -1,22 +1,18 @@
-from flask import render_template, g, has_request_context, url_for, send_from_directory, current_app
+from flask import render_template, g, request, has_request_context, url_for, send_from_directory, current_app
 from markupsafe import Markup
 from dataclasses import dataclass
 import typing as t
 import os
-import json
+import io
 import re
-import urllib.parse
 import importlib
-from .cli import assets_cli
+import pickle
+import functools
+import operator
+from flask.cli import AppGroup
 from .jinja import configure_environment
-from .livereload import LIVERELOAD_SCRIPT
-from .utils import copy_assets, is_abs_url
+from .utils import copy_assets, is_abs_url, normalize_mapping, json_loads, json_dumps, msgpack_loads, msgpack_dumps
 from .builder import BuilderBase
-from .builders.node_deps import NodeDependenciesBuilder
-from .builders.templates import TemplateBuilder
-from .builders.esbuild import EsbuildBuilder
-from .builders.tailwind import TailwindBuilder
-from .builders.cache_worker import CacheServiceWorkerBuilder, CACHE_WORKER_SCRIPT
 
 
 @dataclass
@@ -36,6 +32,9 @@ class AssetsPipelineState:
     output_folder: str
     output_url: str
     mapping_file: str
+    mapping_cache_file: t.Optional[str]
+    precompress: bool
+    hash_cache_file: t.Optional[str]
     esbuild_script: str
     esbuild_cache_metafile: bool
     esbuild_args: t.Sequence[str]
@@ -45,6 +44,7 @@ class AssetsPipelineState:
     esbuild_aliases: t.Mapping[str, str]
     esbuild_external: t.Sequence[str]
     livereload_port: str
+    livereload_poll_interval: t.Optional[float]
     tailwind: str
     tailwind_args: t.Sequence[str]
     tailwind_bin: str
@@ -53,16 +53,20 @@ class AssetsPipelineState:
     copy_files_from_node_modules: t.Mapping[str, str]
     cdn_host: str
     cdn_enabled: bool
+    whitenoise: bool
     cache_worker: bool
     cache_worker_name: t.Optional[str]
     cache_worker_urls: t.Sequence[str]
     cache_worker_filename: str
     cache_worker_register: bool
-    mapping: t.Mapping[str, t.Sequence[str]]
+    mapping: t.Mapping[str, t.Sequence[t.Tuple[str, t.Mapping[str, t.Any]]]]
     watch_template_folders: t.Sequence[str]
     builders: t.Sequence[t.Type[BuilderBase]]
     instance: "AssetsPipeline"
 
+    # dataclass(slots=True) requires python 3.10
+    __slots__ = tuple(__annotations__)
+
 
 PRELOAD_AS_EXT_MAPPING = {
     "css": "style",
@@ -89,6 +93,14 @@ PRELOAD_AS_EXT_MAPPING = {
 }
 
 
+_MODIFIERS = ("static", "import", "prefetch", "modulepreload", "preload")
+
+
+# filenames stamped by copy_assets()
+_STAMPED_FILENAME_RE = re.compile(r"-[0-9a-f]{10}\.[^./]+$")
+_ESBUILD_HASHED_FILENAME_RE = re.compile(r"-[A-Z0-9]{8}\.[^./]+$")
+
+
 class AssetsPipeline:
     def __init__(self, app=None, **kwargs):
         if app:
@@ -111,6 +123,9 @@ class AssetsPipeline:
         output_folder=None,
         output_url=None,
         mapping_file="assets.json",
+        mapping_cache_file=None,
+        precompress=False,
+        hash_cache_file=None,
         esbuild_script=None,
         esbuild_cache_metafile=None,
         esbuild_args=None,
@@ -120,6 +135,7 @@ class AssetsPipeline:
         esbuild_aliases=None,
         esbuild_external=None,
         livereload_port="7878",
+        livereload_poll_interval=None,
         tailwind=None,
         tailwind_args=None,
         tailwind_bin=["npx", "tailwindcss"],
@@ -128,6 +144,7 @@ class AssetsPipeline:
         copy_files_from_node_modules=None,
         cdn_host=None,
         cdn_enabled=None,
+        whitenoise=False,
         cache_worker=False,
         cache_worker_name=None,
         cache_worker_urls=None,
@@ -141,6 +158,8 @@ class AssetsPipeline:
         output_folder = app.config.get("ASSETS_OUTPUT_FOLDER", output_folder)
         output_url = app.config.get("ASSETS_OUTPUT_URL", output_url)
         mapping_file = app.config.get("ASSETS_MAPPING_FILE", mapping_file)
+        mapping_cache_file = app.config.get("ASSETS_MAPPING_CACHE_FILE", mapping_cache_file)
+        hash_cache_file = app.config.get("ASSETS_HASH_CACHE_FILE", hash_cache_file)
         esbuild_cache_metafile = app.config.get("ASSETS_ESBUILD_CACHE_METAFILE", esbuild_cache_metafile)  # fmt: skip
         cdn_enabled = app.config.get("ASSETS_CDN_ENABLED", cdn_enabled)
 
@@ -158,7 +177,7 @@ class AssetsPipeline:
         self.app = app
         state = self.state = AssetsPipelineState(
             bundles={},
-            include=[],
+            include=(),
             route_template=app.config.get("ASSETS_ROUTE_TEMPLATE", route_template),
             inline=app.config.get("ASSETS_INLINE", inline),
             include_inline_on_demand=app.config.get("ASSETS_INCLUDE_INLINE_ON_DEMAND", include_inline_on_demand),
@@ -172,6 +191,9 @@ class AssetsPipeline:
             output_folder=output_folder,
             output_url=output_url,
             mapping_file=os.path.join(app.root_path, mapping_file),
+            mapping_cache_file=os.path.join(app.root_path, mapping_cache_file) if mapping_cache_file else None,
+            precompress=app.config.get("ASSETS_PRECOMPRESS", precompress),
+            hash_cache_file=os.path.join(app.root_path, hash_cache_file) if hash_cache_file else None,
             esbuild_script=app.config.get("ASSETS_ESBUILD_SCRIPT", esbuild_script),
             esbuild_cache_metafile=not app.debug if esbuild_cache_metafile is None else esbuild_cache_metafile,
             esbuild_args=app.config.get("ASSETS_ESBUILD_ARGS", esbuild_args) or [],
@@ -181,6 +203,7 @@ class AssetsPipeline:
             esbuild_aliases=app.config.get("ASSETS_ESBUILD_ALIASES", esbuild_aliases) or {},
             esbuild_external=app.config.get("ASSETS_ESBUILD_EXTERNAL", esbuild_external) or [],
             livereload_port=app.config.get("ASSETS_LIVERELOAD_PORT", livereload_port),
+            livereload_poll_interval=app.config.get("ASSETS_LIVERELOAD_POLL_INTERVAL", livereload_poll_interval),
             tailwind=app.config.get("ASSETS_TAILWIND", tailwind),
             tailwind_args=app.config.get("ASSETS_TAILWIND_ARGS", tailwind_args) or [],
             tailwind_bin=app.config.get("ASSETS_TAILWIND_BIN", tailwind_bin),
@@ -189,6 +212,7 @@ class AssetsPipeline:
             copy_files_from_node_modules=app.config.get("ASSETS_COPY_FILES_FROM_NODE_MODULES", copy_files_from_node_modules) or {},
             cdn_host=app.config.get("ASSETS_CDN_HOST", cdn_host),
             cdn_enabled=not app.debug if cdn_enabled is None else cdn_enabled,
+            whitenoise=app.config.get("ASSETS_WHITENOISE", whitenoise),
             cache_worker=app.config.get("ASSETS_CACHE_WORKER", cache_worker),
             cache_worker_name=app.config.get("ASSETS_CACHE_WORKER_NAME", cache_worker_name),
             cache_worker_urls=app.config.get("ASSETS_CACHE_WORKER_URLS", cache_worker_urls) or [],
@@ -202,7 +226,22 @@ class AssetsPipeline:
         app.extensions["assets"] = state
 
         separate_assets_folder = app.static_folder != state.assets_folder
-        state.mapping = self.read_mapping()
+        self._import_map_tag = None
+        self._livereload_script = None
+        self._built_urls = None
+        self._mapping_stat = None
+        self._invalid_mapping_stat = None
+        self._parsed_urls = {}
+        mapping_cache = self.read_mapping_cache_file() if state.mapping_cache_file and not app.debug else None
+        if mapping_cache:
+            state.mapping = mapping_cache["mapping"]
+            self._parsed_urls = mapping_cache["urls"]
+        else:
+            state.mapping = self.read_mapping()
+        self._cached_parse_url = functools.lru_cache(maxsize=1024)(self.parse_url)
+        self._cached_render_tags = functools.lru_cache(maxsize=256)(self._render_tags)
+        self._sorted_include = None
+        self._resolved_bundle_files = None
         self.map_mapped_files()
         if (
             not app.debug
@@ -229,14 +268,10 @@ class AssetsPipeline:
 
         if separate_assets_folder and app.debug:
             # in debug mode, no need to copy assets to static, we serve them directly
-            app.add_url_rule(
-                f"{state.assets_url_path}/<path:filename>",
-                endpoint="assets",
-                view_func=lambda filename: send_from_directory(
-                    state.assets_folder, filename, max_age=app.get_send_file_max_age(filename)
-                ),
-            )
-            state.assets_endpoint = "assets"
+            self.register_assets_route()
+
+        if state.whitenoise and not app.debug:
+            self.register_whitenoise()
 
         self.map_exposed_node_packages()
 
@@ -244,7 +279,21 @@ class AssetsPipeline:
 
         @app.before_request
         def before_request():
-            g.include_assets = list(state.include)
+            g.include_assets = state.include
+            if app.debug:
+                self.refresh_mapping()
+
+        if not app.debug:
+            @app.after_request
+            def after_request(response):
+                if (
+                    request.endpoint == "static"
+                    and response.status_code in (200, 304)
+                    and self._is_immutable_url(None, request.path)
+                ):
+                    # hashed filenames change with the content of the file
+                    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+                return response
 
         def include_asset(*args, **kwargs):
             self.include(*args, **kwargs)
@@ -256,10 +305,10 @@ class AssetsPipeline:
             static_url=lambda f, **kw: url_for("static", filename=f, **kw),
         )
 
-        app.cli.add_command(assets_cli)
+        app.cli.add_command(LazyAssetsCli("assets"))
         self.builders = []
 
-    def bundle(self, assets, name=None, include=False, priority=1, from_package=None, assets_folder=None, output_folder=None):
+    def bundle(self, assets, name=None, include=False, priority=1, from_package=None, assets_folder=None, output_folder=None, append=False):
         bundles = {}
         if isinstance(assets, dict):
             bundles = assets
@@ -268,11 +317,16 @@ class AssetsPipeline:
         else:
             bundles = {str(f): [f] for f in assets}
         for name, files in bundles.items():
-            self.state.bundles[name] = [
+            files = [
                 f if isinstance(f, Entrypoint) or is_abs_url(f) else
                 Entrypoint.create(f, from_package=from_package, assets_folder=assets_folder, output_folder=output_folder)
                 for f in files
             ]
+            if append and name in self.state.bundles:
+                self.state.bundles[name].extend(files)
+            else:
+                self.state.bundles[name] = files
+        self._resolved_bundle_files = None
         if include:
             self.include(list(bundles.keys()), priority)
 
@@ -291,88 +345,158 @@ class AssetsPipeline:
         else:
             files = [f for files in self.state.bundles.values() for f in files]
         if entrypoints_only:
-            return [f if isinstance(f, Entrypoint) else Entrypoint.create(f) for f in files if not is_abs_url(f)]
+            # bundle() already converted every file which is not an url to an Entrypoint
+            return [f for f in files if isinstance(f, Entrypoint)]
         return files
 
+    def resolved_bundle_files(self):
+        """Returns a list of (resolved path, entrypoint) for all entrypoints of all bundles"""
+        if self._resolved_bundle_files is None:
+            self._resolved_bundle_files = [
+                (entrypoint.resolve_path(self.state.assets_folder), entrypoint)
+                for entrypoint in self.bundle_files(entrypoints_only=True)
+            ]
+        return self._resolved_bundle_files
+
     def include(self, path, priority=1):
-        if not isinstance(path, (tuple, list)):
-            path = [path]
-        assets = g.include_assets if has_request_context() else self.state.include
+        if type(path) is str or not isinstance(path, (tuple, list)):
+            path = (path,)
+        assets = []
         for p in path:
             if not isinstance(p, (tuple, list)) and p in self.state.bundles:
                 assets.extend([(priority, str(e)) for e in self.bundle_files(p)])
             else:
-                assets.append([priority, p])
-
-    def resolve_asset_filename_to_url(self, filename):
-        if has_request_context() and "assets_map" in g:
-            mapping = g.assets_map
+                assets.append((priority, p))
+        if has_request_context():
+            if not isinstance(g.include_assets, list):
+                # copy on write: the request shares the global includes until it modifies them
+                g.include_assets = list(g.include_assets)
+            g.include_assets.extend(assets)
+            g.include_assets_modified = True
+            g.sorted_include_assets = None
         else:
-            mapping = self.state.mapping
-            if self.app.debug:
-                mapping = self.read_mapping()
-            if has_request_context():
-                g.assets_map = mapping
-        return mapping.get(filename, [filename])
+            self.state.include = tuple(self.state.include) + tuple(assets)
+            self._sorted_include = None
 
-    def url(self, filename, with_meta=False, single=True, external=False, with_pre=False, resolve=True):
-        r = re.compile("(defer )?(static|import|prefetch|modulepreload|preload( as [a-z]+)?) ")
+    def sort_includes(self, includes):
+        return [i[1] for i in sorted(includes, key=operator.itemgetter(0), reverse=True)]
+
+    def resolve_asset_filename_to_url(self, filename):
+        if self.app.debug and not has_request_context():
+            self.refresh_mapping()
+        return self.state.mapping.get(filename, [(filename, {})])
+
+    def parse_url(self, filename, resolve=True):
+        """Parses modifiers and fragment metadata from an include and resolves it using the mapping.
+        Returns a list of (url, meta) tuples, relative urls are not yet passed through url_for()
+        """
         meta = {}
         if isinstance(filename, (tuple, list)):
             filename, meta = filename
             if not isinstance(meta, dict):
                 meta = {"modifier": meta}
         else:
-            m = r.match(filename)
-            if m:
-                if m.group(1):
+            modifier, sep, rest = filename.partition(" ")
+            defer = modifier == "defer"
+            if defer:
+                modifier, sep, rest = rest.partition(" ")
+            if sep and modifier in _MODIFIERS:
+                if defer:
                     meta["defer"] = True
-                meta["modifier"] = m.group(2)
-                filename = filename[m.end() :]
-                if meta["modifier"].startswith("preload as "):
-                    meta["modifier"], meta["content_type"] = meta["modifier"].split(" as ", 1)
-                elif meta["modifier"] == "preload":
-                    meta["content_type"] = PRELOAD_AS_EXT_MAPPING.get(
-                        filename.split(".")[-1], "fetch"
-                    )
+                meta["modifier"] = modifier
+                filename = rest
+                if modifier == "preload":
+                    if filename.startswith("as "):
+                        content_type, sep, rest = filename[3:].partition(" ")
+                        if sep and content_type.isalpha() and content_type.islower():
+                            meta["content_type"] = content_type
+                            filename = rest
+                    if "content_type" not in meta:
+                        meta["content_type"] = PRELOAD_AS_EXT_MAPPING.get(
+                            filename.rpartition(".")[2], "fetch"
+                        )
         if "#" in filename:
             filename, fragment = filename.split("#", 1)
-            meta.update(urllib.parse.parse_qs(fragment))
-
-        urls = {}
-        resolved_urls = self.resolve_asset_filename_to_url(filename) if resolve else [filename]
-        for url in resolved_urls:
-            url_meta = dict(meta)
-            if isinstance(url, (tuple, list)):
-                url, _meta = url
-                url_meta.update(_meta)
+            for pair in fragment.split("&"):
+                if "=" in pair:
+                    k, _, v = pair.partition("=")
+                    meta[k] = v
+
+        urls = []
+        if resolve and not is_abs_url(filename):
+            resolved_urls = self.resolve_asset_filename_to_url(filename)
+        else:
+            # absolute urls are never part of the mapping
+            resolved_urls = [(filename, {})]
+        for url, _meta in resolved_urls:
+            url_meta = dict(meta, **_meta)
             if is_abs_url(url):
                 url_meta.setdefault("crossorigin", "anonymous")
-            else:
-                if not url.startswith("/"):
-                    url = url_for(
-                        'static' if url_meta.get("modifier") == "static" else self.state.assets_endpoint,
-                        filename=url,
-                        _external=external if not self.state.cdn_enabled else False,
-                    )
-                if self.state.cdn_enabled:
-                    url = self.state.cdn_host + url
-            if not with_pre and url_meta.get("modifier") in ("prefetch", "preload", "modulepreload"):
-                continue
-            urls[url] = url_meta
-            
+            urls.append((url, url_meta))
+        return urls
+
+    def url(self, filename, with_meta=False, single=True, external=False, with_pre=False, resolve=True):
+        urls = self._resolve_urls(filename, external, with_pre, resolve)
         urls = list(urls.keys() if not with_meta else urls.items())
         return urls[0] if single else urls
 
+    def _resolve_urls(self, filename, external=False, with_pre=False, resolve=True):
+        if self.app.debug and not has_request_context():
+            # outside requests (cli, background jobs) the mapping is not refreshed in before_request,
+            # this clears the cached urls when the mapping file changed
+            self.refresh_mapping()
+        if not isinstance(filename, str):
+            parsed_urls = self.parse_url(filename, resolve)
+        else:
+            parsed_urls = self._parsed_urls.get(filename) if resolve else None
+            if parsed_urls is None:
+                parsed_urls = self._cached_parse_url(filename, resolve)
+
+        cdn_enabled = self.state.cdn_enabled
+        cdn_host = self.state.cdn_host
+        assets_endpoint = self.state.assets_endpoint
+        external = external if not cdn_enabled else False
+
+        urls = {}
+        url_for_cache = None
+        for url, meta in parsed_urls:
+            modifier = meta.get("modifier")
+            if not with_pre and modifier in ("prefetch", "preload", "modulepreload"):
+                continue
+            if not is_abs_url(url):
+                if not url.startswith("/"):
+                    endpoint = "static" if modifier == "static" else assets_endpoint
+                    if url_for_cache is None:
+                        # urls are built once per request
+                        url_for_cache = g.setdefault("assets_url_for_cache", {})
+                    key = (endpoint, url, external)
+                    if key not in url_for_cache:
+                        url_for_cache[key] = url_for(endpoint, filename=url, _external=external)
+                    url = url_for_cache[key]
+                if cdn_enabled:
+                    url = cdn_host + url
+            urls[url] = dict(meta)
+        return urls
+
+    def included_paths(self):
+        """Returns the included paths (global ones and the ones from the current request) sorted by priority"""
+        if has_request_context() and g.get("include_assets_modified"):
+            paths = g.sorted_include_assets
+            if paths is None:
+                paths = g.sorted_include_assets = self.sort_includes(g.include_assets)
+            return paths
+        if self._sorted_include is None:
+            self._sorted_include = self.sort_includes(self.state.include)
+        return self._sorted_include
+
     def urls(self, paths=None, with_meta=False, external=False, with_pre=False, resolve=True):
         if paths is None:
-            includes = g.include_assets if has_request_context() and 'include_assets' in g else self.state.include
-            paths = [i[1] for i in sorted(includes, key=lambda i: i[0], reverse=True)]
+            paths = self.included_paths()
         elif isinstance(paths, str):
             paths = [paths]
         urls = {}
         for f in paths:
-            urls.update(dict(self.url(f, with_meta=True, single=False, external=external, with_pre=with_pre, resolve=resolve)))
+            urls.update(self._resolve_urls(f, external, with_pre, resolve))
         return urls.items() if with_meta else list(urls.keys())
 
     def split_urls(self, paths=None, with_meta=False, external=False, resolve=True):
@@ -381,51 +505,79 @@ class AssetsPipeline:
         scripts = []
         styles = []
         for url, meta in urls:
+            item = (url, meta) if with_meta else url
             if meta.get("modifier") in ("prefetch", "preload", "modulepreload"):
-                pre.append((url, meta) if with_meta else url)
+                pre.append(item)
             elif url.endswith(".css") or meta.get("content_type") == "style":
-                styles.append((url, meta) if with_meta else url)
+                styles.append(item)
             else:
-                scripts.append((url, meta) if with_meta else url)
+                scripts.append(item)
         return pre, scripts, styles
 
     def tags(self, paths=None, external=False, with_pre=True, resolve=True):
-        tags = []
-        pre = []
+        if paths is None:
+            paths = self.included_paths()
+        elif isinstance(paths, str):
+            paths = (paths,)
+        if self.app.debug:
+            return self._render_tags(paths, external, with_pre, resolve)
+        try:
+            key = (tuple(paths), external, with_pre, resolve, request.url_root if has_request_context() else None)
+            hash(key)
+        except TypeError:
+            # unhashable paths
+            return self._render_tags(paths, external, with_pre, resolve)
+        # the url root is part of the key because urls are built relative to it
+        return self._cached_render_tags(*key)
+
+    def _render_tags(self, paths, external=False, with_pre=True, resolve=True, url_root=None):
+        tags = io.StringIO()
+        pre = io.StringIO()
         for url, meta in self.urls(paths, with_meta=True, external=external, with_pre=with_pre, resolve=resolve):
-            attrs = "".join(
-                f' {k}' if v is True else f' {k}="{v}"'
-                for k, v in meta.items()
-                if v and k not in ("modifier", "content_type")
+            attrs = tuple(
+                (k, v) for k, v in meta.items() if v and k not in ("modifier", "content_type")
             )
-            if meta.get("modifier") == "prefetch":
-                pre.append('<link rel="prefetch" href="%s"%s>' % (url, attrs))
-            elif meta.get("modifier") == "preload":
-                pre.append(
-                    '<link rel="preload" href="%s" as="%s"%s>' % (url, meta["content_type"], attrs)
-                )
-            elif meta.get("modifier") == "modulepreload":
-                pre.append('<link rel="modulepreload" href="%s"%s>' % (url, attrs))
-            elif meta.get("modifier") == "import":
-                tags.append('<script src="%s" type="module"%s></script>' % (url, attrs))
+            if not attrs:
+                attrs = ""
+            elif self.app.debug:
+                attrs = render_tag_attrs.__wrapped__(attrs)
+            else:
+                try:
+                    attrs = render_tag_attrs(attrs)
+                except TypeError:
+                    # unhashable values provided as meta
+                    attrs = render_tag_attrs.__wrapped__(attrs)
+            modifier = meta.get("modifier")
+            if modifier == "prefetch":
+                pre.write(f'<link rel="prefetch" href="{url}"{attrs}>\n')
+            elif modifier == "preload":
+                pre.write(f'<link rel="preload" href="{url}" as="{meta["content_type"]}"{attrs}>\n')
+            elif modifier == "modulepreload":
+                pre.write(f'<link rel="modulepreload" href="{url}"{attrs}>\n')
+            elif modifier == "import":
+                tags.write(f'<script src="{url}" type="module"{attrs}></script>\n')
             elif url.endswith(".css") or meta.get("content_type") == "style":
-                tags.append('<link rel="stylesheet" href="%s"%s>' % (url, attrs))
+                tags.write(f'<link rel="stylesheet" href="{url}"{attrs}>\n')
             else:
-                tags.append('<script src="%s"%s></script>' % (url, attrs))
-        return Markup("\n".join(pre + tags))
+                tags.write(f'<script src="{url}"{attrs}></script>\n')
+        # strip the trailing newline
+        return Markup((pre.getvalue() + tags.getvalue())[:-1])
 
     def head(self):
         tags = []
         if self.state.import_map:
-            tags.append(
-                '<script type="importmap">%s</script>'
-                % json.dumps({"imports": self.state.import_map})
-            )
+            if self._import_map_tag is None:
+                self._import_map_tag = f'<script type="importmap">{json_dumps({"imports": self.state.import_map})}</script>'
+            tags.append(self._import_map_tag)
         tags.append(self.tags())
         if self.state.cache_worker_register:
+            from .builders.cache_worker import CACHE_WORKER_SCRIPT
             tags.append(CACHE_WORKER_SCRIPT % {"worker_url": url_for("cache_service_worker")})
         if self.app.debug:
-            tags.append(LIVERELOAD_SCRIPT % {"livereload_port": self.state.livereload_port})
+            if self._livereload_script is None:
+                from .livereload import LIVERELOAD_SCRIPT
+                self._livereload_script = LIVERELOAD_SCRIPT % {"livereload_port": self.state.livereload_port}
+            tags.append(self._livereload_script)
         return Markup("\n".join(tags))
 
     def add_route(self, endpoint, url, decorators=None, template=None, app=None, **options):
@@ -447,12 +599,13 @@ class AssetsPipeline:
 
     def map_import(self, name, url):
         self.state.import_map[name] = url
+        self._import_map_tag = None
 
     def map_mapped_files(self):
         for src, out in self.state.mapping.items():
-            for file in out:
-                if isinstance(file, (tuple, list)) and file[1].get("map_as"):
-                    self.map_import(file[1]["map_as"], file[0])
+            for url, meta in out:
+                if meta.get("map_as"):
+                    self.map_import(meta["map_as"], url)
 
     def map_exposed_node_packages(self):
         for name in self.state.expose_node_packages:
@@ -462,18 +615,67 @@ class AssetsPipeline:
 
     def read_mapping(self):
         try:
-            with open(self.state.mapping_file, "r") as f:
-                return json.load(f)
-        except Exception:
+            st = os.stat(self.state.mapping_file)
+        except OSError:
+            self._mapping_stat = None
             return {}
+        stat = (st.st_mtime_ns, st.st_size)
+        try:
+            mapping = load_mapping_file(self.state.mapping_file, stat)
+        except OSError:
+            return {}
+        except ValueError:
+            # decoding errors of json, orjson and msgpack are all ValueErrors
+            if stat != self._invalid_mapping_stat:
+                self.app.logger.warning(f"Invalid mapping file: {self.state.mapping_file}")
+                self._invalid_mapping_stat = stat
+            return {}
+        self._mapping_stat = stat
+        return mapping
+
+    def refresh_mapping(self):
+        """Reloads the mapping if the mapping file has changed, clearing the url cache"""
+        stat = self._mapping_stat
+        mapping = self.read_mapping()
+        if self._mapping_stat != stat:
+            self.state.mapping = mapping
+            self._parsed_urls = {}
+            self._cached_parse_url.cache_clear()
+            self._cached_render_tags.cache_clear()
+        return self.state.mapping
 
     def write_mapping_file(self, mapping, out=None, merge=False):
         if not out:
             out = self.state.mapping_file
-        with open(out, "rw" if merge else "w") as f:
-            if merge:
-                mapping = dict(json.load(f), **mapping)
-            json.dump(mapping, f, indent=2)
+        msgpack = out.endswith(".msgpack")
+        if merge and os.path.exists(out):
+            with open(out, "rb") as f:
+                data = f.read()
+            mapping = dict(msgpack_loads(data) if msgpack else json_loads(data), **mapping)
+        # write to a temporary file first so that the mapping is never read partially written
+        tmp = out + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(msgpack_dumps(mapping) if msgpack else json_dumps(mapping).encode("utf-8"))
+        os.replace(tmp, out)
+
+    def read_mapping_cache_file(self):
+        """Loads the mapping and the parsed global includes saved by write_mapping_cache_file(),
+        unless the mapping file is more recent
+        """
+        try:
+            if os.path.getmtime(self.state.mapping_cache_file) < os.path.getmtime(self.state.mapping_file):
+                return None
+            with open(self.state.mapping_cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def write_mapping_cache_file(self, out=None):
+        if not out:
+            out = self.state.mapping_cache_file
+        urls = {path: self.parse_url(path) for _, path in self.state.include if isinstance(path, str)}
+        with open(out, "wb") as f:
+            pickle.dump({"mapping": self.state.mapping, "urls": urls}, f)
 
     def copy_assets_to_static(self, src=None, dest=None, stamp=None, ignore_files=None):
         if src is None:
@@ -489,11 +691,17 @@ class AssetsPipeline:
         if self.state.tailwind:
             ignore_files.append(self.state.tailwind)
 
-        return copy_assets(src, dest, stamp, ignore_files, self.app.logger)
+        return copy_assets(src, dest, stamp, ignore_files, self.app.logger, self.state.hash_cache_file)
     
     def load_builders(self):
         if self.builders:
             return self.builders
+        # builders are imported here so that serving requests does not require loading them
+        from .builders.node_deps import NodeDependenciesBuilder
+        from .builders.templates import TemplateBuilder
+        from .builders.esbuild import EsbuildBuilder
+        from .builders.tailwind import TailwindBuilder
+        from .builders.cache_worker import CacheServiceWorkerBuilder
         builtins = [
             NodeDependenciesBuilder(),
             TemplateBuilder(),
@@ -541,6 +749,56 @@ class AssetsPipeline:
         builder.init(self)
         return builder
     
+    def register_assets_route(self, url=None):
+        def view_func(filename):
+            # send_from_directory() streams the file using the server's wsgi.file_wrapper
+            # (or X-Sendfile when USE_X_SENDFILE is enabled) rather than reading it in python
+            return send_from_directory(
+                self.state.assets_folder, filename, max_age=self.app.get_send_file_max_age(filename)
+            )
+        self.app.add_url_rule(url or f"{self.state.assets_url_path}/<path:filename>", endpoint="assets", view_func=view_func)
+        self.state.assets_endpoint = "assets"
+
+    def register_whitenoise(self):
+        try:
+            from whitenoise import WhiteNoise
+        except ImportError:
+            raise Exception("whitenoise must be installed to serve assets using whitenoise")
+        # serve static files straight from the wsgi layer, without going through flask
+        wsgi_app = WhiteNoise(
+            self.app.wsgi_app,
+            root=self.app.static_folder,
+            prefix=self.app.static_url_path,
+            autorefresh=False,
+            immutable_file_test=self._is_immutable_url,
+        )
+        if os.path.relpath(self.state.output_folder, self.app.static_folder).startswith(".."):
+            wsgi_app.add_files(self.state.output_folder, prefix=self.state.output_url)
+        self.app.wsgi_app = wsgi_app
+
+    def _is_immutable_url(self, path, url):
+        """Whether url is a file with a hashed filename produced by the build: esbuild outputs (including chunks
+        which are not listed in the mapping) or stamped files from the mapping
+        """
+        if _ESBUILD_HASHED_FILENAME_RE.search(url) and url.startswith(self.state.output_url + "/"):
+            return True
+        if not (_STAMPED_FILENAME_RE.search(url) or _ESBUILD_HASHED_FILENAME_RE.search(url)):
+            return False
+        return url in self._get_built_urls()
+
+    def _get_built_urls(self):
+        mapping = self.state.mapping
+        if self._built_urls is None or self._built_urls[0] is not mapping:
+            urls = set()
+            for entries in mapping.values():
+                for entry in entries:
+                    url = entry[0] if isinstance(entry, (tuple, list)) else entry
+                    if is_abs_url(url):
+                        continue
+                    urls.add(url if url.startswith("/") else f"{self.app.static_url_path}/{url}")
+            self._built_urls = (mapping, urls)
+        return self._built_urls[1]
+
     def register_cache_worker_route(self, url=None):
         def view_func():
             resp = send_from_directory(self.state.output_folder, self.state.cache_worker_filename, mimetype="text/javascript")
@@ -549,6 +807,20 @@ class AssetsPipeline:
         self.app.add_url_rule(url or f"/{self.state.cache_worker_filename}", endpoint="cache_service_worker", view_func=view_func)
 
 
+class LazyAssetsCli(AppGroup):
+    """Proxy to the assets command group which only imports the cli module (and the builders) when used"""
+
+    def load(self):
+        from .cli import assets_cli
+        return assets_cli
+
+    def list_commands(self, ctx):
+        return self.load().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self.load().get_command(ctx, cmd_name)
+
+
 @dataclass
 class Entrypoint:
     filename: str
@@ -565,14 +837,14 @@ class Entrypoint:
             outfile = filename
         path = filename
         if assets_folder and not os.path.isabs(filename):
-            path = os.path.join(assets_folder, filename)
+            path = resolve_asset_path(assets_folder, filename)
             if not outfile:
                 outfile = filename
         if output_folder:
             outfile = os.path.join(output_folder, outfile or filename)
         return cls(path, outfile, from_package)
     
-    @property
+    @functools.cached_property
     def path(self):
         return f"{self.from_package}:{self.filename}" if self.from_package else self.filename
     
@@ -587,7 +859,7 @@ class Entrypoint:
         elif self.from_package:
             filename = resolve_package_file(self.from_package, filename)
         elif not os.path.isabs(filename) and assets_folder:
-            filename = os.path.join(assets_folder, filename)
+            filename = resolve_asset_path(assets_folder, filename)
         return filename
     
     def __str__(self):
@@ -597,6 +869,48 @@ class Entrypoint:
         return f"{self.path}={self.outfile}" if self.outfile else self.path
 
 
+@functools.lru_cache(maxsize=2048)
+def resolve_asset_path(assets_folder, filename):
+    return os.path.abspath(os.path.join(assets_folder, filename))
+
+
+@functools.lru_cache(maxsize=2048)
 def resolve_package_file(package, filename):
     m = importlib.import_module(package)
-    return os.path.join(os.path.dirname(m.__file__), filename)
\ No newline at end of file
+    return os.path.join(os.path.dirname(m.__file__), filename)
+
+
+@functools.lru_cache(maxsize=8)
+def load_mapping_file(filename, stat):
+    # stat is only part of the cache key so that the file is parsed again when it changes
+    with open(filename, "rb") as f:
+        data = f.read()
+    if filename.endswith(".msgpack"):
+        mapping = msgpack_loads(data)
+    else:
+        mapping = json_loads(data)
+    return normalize_mapping(mapping)
+
+
+@functools.lru_cache(maxsize=512)
+def render_tag_attrs(attrs):
+    return "".join(f' {k}' if v is True else f' {k}="{v}"' for k, v in attrs)
+
+
+# names which used to be imported eagerly, the builders and the cli are only imported when first accessed
+_LAZY_ATTRS = {
+    "assets_cli": ".cli",
+    "LIVERELOAD_SCRIPT": ".livereload",
+    "NodeDependenciesBuilder": ".builders.node_deps",
+    "TemplateBuilder": ".builders.templates",
+    "EsbuildBuilder": ".builders.esbuild",
+    "TailwindBuilder": ".builders.tailwind",
+    "CacheServiceWorkerBuilder": ".builders.cache_worker",
+    "CACHE_WORKER_SCRIPT": ".builders.cache_worker",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        return getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
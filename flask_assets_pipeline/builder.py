@@ -21,7 +21,7 @@ class BuilderBase:
             return
         
         kwargs = (
-            {"text": True, "bufsize": 1, "stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+            {"bufsize": 65536, "stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
             if self.dev_worker_callback
             else {}
         )
@@ -30,12 +30,28 @@ class BuilderBase:
             process.wait()
             return process
 
+        matchline = re.compile(self.matchline) if self.matchline else None
+
+        def handle_line(line):
+            line = line.decode("utf-8", "replace").strip()
+            click.echo(self.prefix + line)
+            if matchline is None or matchline.match(line):
+                self.dev_worker_callback(build_only, livereloader)
+
         def task():
+            # read whatever is available in the pipe and split lines ourselves rather than using readline()
+            buf = b""
             while not exit_event or not exit_event.is_set():
-                line = process.stdout.readline().strip()
-                click.echo(self.prefix + line)
-                if not self.matchline or re.match(self.matchline, line):
-                    self.dev_worker_callback(build_only, livereloader)
+                chunk = process.stdout.read1(65536)
+                if not chunk:
+                    break
+                buf += chunk
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    handle_line(line)
+            if buf:
+                # last line without a trailing newline (eg. an error message when the worker crashed)
+                handle_line(buf)
 
         thread = threading.Thread(target=task)
         thread.start()
@@ -2,6 +2,7 @@ from ..builder import BuilderBase
 import os
 import json
 import uuid
+import hashlib
 
 
 CACHE_WORKER_SCRIPT = """
@@ -19,21 +20,70 @@ class CacheServiceWorkerBuilder(BuilderBase):
         if self.assets.state.tailwind:
             urls.append(f"{self.assets.state.output_url}/{self.assets.state.tailwind}")
         urls.extend(self.assets.state.cache_worker_urls)
-        cache_name = self.assets.state.cache_worker_name or f"assets-{str(uuid.uuid4())[0:8]}"
-        out = self.generate(cache_name, urls)
         filename = os.path.join(self.assets.state.output_folder, self.assets.state.cache_worker_filename)
-        with open(filename, 'w') as f:
+        # skip generating the worker when its inputs (including the cached files) did not change,
+        # which also keeps its random cache name
+        files_sig = self.get_files_signature(urls)
+        header = "/* AUTO-GENERATED SERVICE WORKER */\n"
+        if files_sig is not None:
+            inputs_hash = hashlib.blake2b(
+                json.dumps(
+                    [self.assets.state.cache_worker_name, urls, files_sig, get_template_tail()], separators=(",", ":")
+                ).encode("utf-8"),
+                digest_size=16,
+            ).hexdigest()
+            header = f"/* AUTO-GENERATED SERVICE WORKER ({inputs_hash}) */\n"
+            if os.path.exists(filename):
+                with open(filename) as f:
+                    if f.readline() == header:
+                        return
+        cache_name = self.assets.state.cache_worker_name or f"assets-{str(uuid.uuid4())[0:8]}"
+        out = self.generate(cache_name, urls, header)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp = filename + ".tmp"
+        with open(tmp, 'w') as f:
             f.write(out)
+        os.replace(tmp, filename)
 
-    def generate(self, cache_name, urls):
+    def get_files_signature(self, urls):
+        """Returns the mtime and size of the files behind urls,
+        or None if some urls are not static files (eg. pages) as their content cannot be known
+        """
+        state = self.assets.state
+        static_url_path = self.assets.app.static_url_path
+        sig = []
+        for url in urls:
+            if url.startswith(state.output_url + "/"):
+                path = os.path.join(state.output_folder, url[len(state.output_url) + 1 :])
+            elif static_url_path and url.startswith(static_url_path + "/"):
+                path = os.path.join(self.assets.app.static_folder, url[len(static_url_path) + 1 :])
+            else:
+                return None
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            sig.append((st.st_mtime_ns, st.st_size))
+        return sig
+
+    def generate(self, cache_name, urls, header="/* AUTO-GENERATED SERVICE WORKER */\n"):
         inject = "".join([
-            "/* AUTO-GENERATED SERVICE WORKER */\n\n",
+            header,
+            "\n",
             "const CACHE_NAME = %s;\n" % json.dumps(cache_name),
-            "const CACHE_URLS = %s;\n" % json.dumps(urls)
+            "const CACHE_URLS = %s;\n" % json.dumps(urls, separators=(",", ":"))
         ])
+        return inject + get_template_tail()
+
+
+_TEMPLATE_TAIL = None
+
+
+def get_template_tail():
+    """Returns the worker template without its first lines, which are replaced by generate()"""
+    global _TEMPLATE_TAIL
+    if _TEMPLATE_TAIL is None:
         template_filename = os.path.join(os.path.dirname(__file__), 'cache-worker.js')
         with open(template_filename) as f:
-            lines = f.readlines()
-        del lines[0:6]
-        lines.insert(0, inject)
-        return "".join(lines)
\ No newline at end of file
+            _TEMPLATE_TAIL = f.read().split("\n", 6)[6]
+    return _TEMPLATE_TAIL
@@ -1,16 +1,22 @@
 from ..builder import BuilderBase
+from ..utils import json_load_file, hash_file
 import tempfile
 import subprocess
 import os
 import json
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 
 class EsbuildBuilder(BuilderBase):
     matchline = "\[watch\] build finished"
     merge_metafile = False
-
     def init(self, assets):
         super().init(assets)
+        self.metafile_hashes = {}
         self.metafile = tempfile.NamedTemporaryFile(prefix="assets", delete=False)
 
     @property
@@ -52,8 +58,7 @@ class EsbuildBuilder(BuilderBase):
         state = self.assets.state
         inputs = []
         entrypoints = []
-        for entrypoint in self.assets.bundle_files(entrypoints_only=True):
-            path = entrypoint.resolve_path(state.assets_folder)
+        for path, entrypoint in self.assets.resolved_bundle_files():
             inputs.append(path)
             if entrypoint.outfile:
                 path = f"{entrypoint.outfile}={path}"
@@ -92,8 +97,12 @@ class EsbuildBuilder(BuilderBase):
             args.extend(state.esbuild_args)
             cmd = self.make_esbuild_command(args)
 
-        env = {
-            "NODE_PATH": state.node_modules_path,
+        env = {"NODE_PATH": state.node_modules_path}
+        if not state.esbuild_script:
+            # the esbuild cli gets everything from its arguments, only scripts read the config from the env
+            return cmd, env
+
+        env.update({
             "ESBUILD_DEV": "1" if dev else "0",
             "ESBUILD_WATCH": "1" if watch else "0",
             "ESBUILD_INPUTS": ";".join(inputs),
@@ -107,7 +116,7 @@ class EsbuildBuilder(BuilderBase):
                 [f"{k}={v}" for k, v in state.esbuild_aliases.items()]
             ),
             "ESBUILD_EXTERNAL": ";".join(state.esbuild_external),
-        }
+        })
 
         return cmd, env
 
@@ -121,49 +130,39 @@ class EsbuildBuilder(BuilderBase):
         return script_filename
 
     def make_esbuild_command(self, args):
-        return (
-            self.assets.state.esbuild_bin + args
-            if isinstance(self.assets.state.esbuild_bin, list)
-            else [self.assets.state.esbuild_bin, *args]
-        )
+        return make_esbuild_command(self.assets.state, args)
 
     def convert_metafile(self, filename=None):
         state = self.assets.state
         if not filename:
             filename = state.esbuild_metafile
-        outputrel = os.path.relpath(state.output_folder)
+        outputrel_len = len(os.path.relpath(state.output_folder))
+        output_url = state.output_url
 
-        entrypoints = {}
-        for entrypoint in self.assets.bundle_files(entrypoints_only=True):
-            path = entrypoint.resolve_path(state.assets_folder)
-            entrypoints[path] = entrypoint
-
-        with open(filename) as f:
-            meta = json.load(f)
+        entrypoints = dict(self.assets.resolved_bundle_files())
 
         inputs = []
         mapping = {}
-        for output, info in meta["outputs"].items():
+        for output, info in iter_metafile_outputs(filename):
             if "entryPoint" not in info:
                 continue
-            path = os.path.abspath(info["entryPoint"])
-            if path not in entrypoints:
+            entrypoint = entrypoints.get(os.path.abspath(info["entryPoint"]))
+            if entrypoint is None:
                 continue
-            if not entrypoints[path].is_abs:
-                inputs.append(entrypoints[path].filename)
-            path = entrypoints[path].path
-            o = mapping.setdefault(path, [])
-            url = state.output_url + output[len(outputrel) :]
+            if not entrypoint.is_abs:
+                inputs.append(entrypoint.filename)
+            o = mapping.setdefault(entrypoint.path, [])
+            url = output_url + output[outputrel_len:]
             if url.endswith(".js"):
                 url = [url, {"modifier": "import"}]
             o.append(url)
             if "cssBundle" in info:
-                o.append(state.output_url + info["cssBundle"][len(outputrel) :])
+                o.append(output_url + info["cssBundle"][outputrel_len:])
             for import_info in info["imports"]:
                 if import_info["kind"] == "import-statement":
                     o.append(
                         [
-                            state.output_url + import_info["path"][len(outputrel) :],
+                            output_url + import_info["path"][outputrel_len:],
                             {"modifier": "modulepreload"},
                         ]
                     )
@@ -171,6 +170,11 @@ class EsbuildBuilder(BuilderBase):
         return inputs, mapping
 
     def write_mapping_from_metafile(self, filename, out=None, merge=False):
+        # esbuild reports finished builds (and rewrites the metafile) even when no output changed
+        metafile_hash = hash_file(filename)
+        key = (filename, out, merge)
+        if self.metafile_hashes.get(key) == metafile_hash and os.path.exists(out or self.assets.state.mapping_file):
+            return False
         try:
             inputs, mapping = self.convert_metafile(
                 filename
@@ -178,4 +182,25 @@ class EsbuildBuilder(BuilderBase):
         except json.JSONDecodeError:
             return False
         self.assets.write_mapping_file(mapping, out, merge)
+        self.metafile_hashes[key] = metafile_hash
         return True
+
+
+def make_esbuild_command(state, args):
+    return (
+        state.esbuild_bin + args
+        if isinstance(state.esbuild_bin, list)
+        else [state.esbuild_bin, *args]
+    )
+
+
+def iter_metafile_outputs(filename):
+    if not ijson:
+        yield from json_load_file(filename)["outputs"].items()
+        return
+    # stream outputs one by one rather than loading the whole metafile in memory
+    with open(filename, "rb") as f:
+        try:
+            yield from ijson.kvitems(f, "outputs")
+        except ijson.JSONError as e:
+            raise json.JSONDecodeError(str(e), "", 0)
@@ -1,37 +1,76 @@
 from ..builder import BuilderBase
 from ..utils import copy_files
-from .esbuild import EsbuildBuilder
+from .esbuild import make_esbuild_command
 import subprocess
+import tempfile
 import os
 
 
 class NodeDependenciesBuilder(BuilderBase):
     def build(self, mapping, ignore_assets):
-        for pkg in self.assets.state.expose_node_packages:
-            self.build_node_package(pkg)
+        if self.assets.state.expose_node_packages:
+            self.build_node_packages(self.assets.state.expose_node_packages)
         if self.assets.state.copy_files_from_node_modules:
             self.copy_files_from_node_modules(self.assets.state.copy_files_from_node_modules)
 
     def build_node_package(self, name):
-        if ":" in name:
-            name, input = name.split(":", 1)
-        else:
-            input = f"export * from '{name}'"
-        outfile = os.path.join(self.state.output_folder, "vendor", f"{name}.js")
-        if not os.path.exists(outfile):
-            os.makedirs(os.path.dirname(outfile), exist_ok=True)
-            subprocess.run(
-                EsbuildBuilder(self.assets).make_esbuild_command(
-                    [
+        self.build_node_packages([name])
+
+    def build_node_packages(self, names):
+        outdir = os.path.join(self.assets.state.output_folder, "vendor")
+        packages = []
+        for name in names:
+            if ":" in name:
+                name, input = name.split(":", 1)
+                if not os.path.exists(os.path.join(outdir, f"{name}.js")):
+                    # custom code is piped through stdin so that relative imports are resolved from the current directory
+                    self.build_node_package_from_input(name, input, outdir)
+            elif not os.path.exists(os.path.join(outdir, f"{name}.js")):
+                packages.append(name)
+        if not packages:
+            return
+        # bundle all packages with a single esbuild process, stubs are created in the current directory
+        # so that packages are resolved from its node_modules like they would be from stdin
+        with tempfile.TemporaryDirectory(prefix=".assets-vendor-", dir=os.getcwd()) as tmpdir:
+            entrypoints = []
+            for i, name in enumerate(packages):
+                stub = os.path.join(tmpdir, f"{i}.js")
+                with open(stub, "w") as f:
+                    f.write(f"export * from '{name}'")
+                entrypoints.append(f"{name}={stub}")
+            os.makedirs(outdir, exist_ok=True)
+            proc = subprocess.run(
+                make_esbuild_command(
+                    self.assets.state,
+                    entrypoints + [
                         "--bundle",
                         "--minify",
                         "--format=esm",
-                        f"--sourcefile={name}.js",
-                        f"--outfile={outfile}",
+                        f"--outdir={outdir}",
                     ]
-                ),
-                input=input.encode("utf-8"),
+                )
             )
+        if proc.returncode != 0 and len(packages) > 1:
+            # esbuild does not write anything on error, build packages one by one so that only failing ones are missing
+            for name in packages:
+                self.build_node_package_from_input(name, f"export * from '{name}'", outdir)
+
+    def build_node_package_from_input(self, name, input, outdir):
+        outfile = os.path.join(outdir, f"{name}.js")
+        os.makedirs(os.path.dirname(outfile), exist_ok=True)
+        return subprocess.run(
+            make_esbuild_command(
+                self.assets.state,
+                [
+                    "--bundle",
+                    "--minify",
+                    "--format=esm",
+                    f"--sourcefile={name}.js",
+                    f"--outfile={outfile}",
+                ]
+            ),
+            input=input.encode("utf-8"),
+        )
 
     def copy_files_from_node_modules(self, files):
         copy_files(files, self.assets.state.node_modules_path,
@@ -7,6 +7,7 @@ import shutil
 class TailwindBuilder(BuilderBase):
     prefix = "[tailwind]"
     matchline = "Done in"
+    tailwind_config_checked = False
 
     def start_dev_worker(self, exit_event, build_only=False, livereloader=None):
         self.check_tailwind_config()
@@ -52,6 +53,8 @@ class TailwindBuilder(BuilderBase):
         return cmd, env
 
     def check_tailwind_config(self):
+        if self.tailwind_config_checked:
+            return
         state = self.assets.state
         if not os.path.exists("tailwind.config.js"):
             shutil.copyfile(
@@ -59,4 +62,5 @@ class TailwindBuilder(BuilderBase):
             )
         if not os.path.exists(os.path.join(state.assets_folder, state.tailwind)):
             with open(os.path.join(state.assets_folder, state.tailwind), "w") as f:
-                f.write("@tailwind base;\n@tailwind components;\n@tailwind utilities;")
\ No newline at end of file
+                f.write("@tailwind base;\n@tailwind components;\n@tailwind utilities;")
+        self.tailwind_config_checked = True
@@ -1,12 +1,17 @@
 from ..builder import BuilderBase
 import click
 import os
+import threading
 from flask import current_app
 from watchdog.events import FileSystemEventHandler
 from jinja2 import TemplateNotFound
 
 
 class TemplateBuilder(BuilderBase):
+    def init(self, assets):
+        super().init(assets)
+        self.extracted_templates = {}
+
     def start_dev_worker(self, exit_event, build_only=False, livereloader=None):
         if self.assets.state.inline:
             click.echo("Extracting bundled assets from templates")
@@ -20,8 +25,12 @@ class TemplateBuilder(BuilderBase):
                 if bp.template_folder:
                     watch_template_folder.append(os.path.join(bp.root_path, bp.template_folder))
             watch_template_folder.extend(self.assets.state.watch_template_folders)
+            # blueprints often share the app template folder, only watch each folder once
+            watched = set()
             for path in watch_template_folder:
-                if os.path.exists(path):
+                realpath = os.path.realpath(path)
+                if realpath not in watched and os.path.isdir(realpath):
+                    watched.add(realpath)
                     livereloader.observer.schedule(
                         TemplateCompilerHandler(path, self.assets.app, livereloader), path, recursive=True
                     )
@@ -37,35 +46,70 @@ class TemplateBuilder(BuilderBase):
             loader = env.loader
         with self.assets.app.app_context():
             env.write_inline_assets = write
-            for template in loader.list_templates():
-                if template.rsplit(".", 1)[1].lower() in self.assets.state.inline_template_exts:
-                    source = loader.get_source(env, template)[0]
-                    env.compile(source, template) # force the compilation so the extension parse() method is executed
+            templates = [
+                template for template in loader.list_templates()
+                if os.path.splitext(template)[1].lower() in self.assets.state.inline_template_exts
+            ]
+            for template in templates:
+                source, filename, _ = loader.get_source(env, template)
+                # bundles from templates which did not change since the last extraction are already registered
+                key = (os.path.getmtime(filename) if filename else None, write)
+                if filename and self.extracted_templates.get(template) == key:
+                    continue
+                env.compile(source, template) # force the compilation so the extension parse() method is executed
+                self.extracted_templates[template] = key
 
 
 class TemplateCompilerHandler(FileSystemEventHandler):
+    debounce_delay = 0.1
+
     def __init__(self, path, app, broker=None):
         self.path = os.path.abspath(path)
         self.app = app
         self.broker = broker
+        self.pending = set()
+        self.mtimes = {}
+        self.timer = None
+        self.lock = threading.Lock()
 
     def on_modified(self, event):
         if not event.is_directory and os.path.abspath(event.src_path).startswith(self.path):
             tpl = os.path.relpath(event.src_path, self.path)
-            if template.rsplit(".", 1)[1].lower() not in self.app.extensions["assets"].inline_template_exts:
+            if os.path.splitext(tpl)[1].lower() not in self.app.extensions["assets"].inline_template_exts:
                 return
             try:
-                with self.app.app_context():
-                    try:
-                        source = self.app.jinja_env.loader.get_source(self.app.jinja_env, tpl)[0]
-                        self.app.jinja_env.compile(source, tpl) # force the compilation so the extension parse() method is executed
-                    except TemplateNotFound:
-                        # handle loaders that do weird stuff :)
-                        for template in self.app.jinja_loader.list_templates():
-                            if template.endswith(tpl):
-                                self.app.jinja_env.get_template(template)
-                if self.broker:
-                    self.broker.ping()
-            except:
-                raise
+                st = os.stat(event.src_path)
+            except OSError:
+                return
+            sig = (st.st_mtime_ns, st.st_size)
+            with self.lock:
+                if self.mtimes.get(tpl) == sig:
+                    # the content did not change (eg. chmod)
+                    return
+                self.mtimes[tpl] = sig
+                # editors emit bursts of events when saving, compile once they are done
+                self.pending.add(tpl)
+                if self.timer:
+                    self.timer.cancel()
+                self.timer = threading.Timer(self.debounce_delay, self.compile_pending)
+                self.timer.daemon = True
+                self.timer.start()
 
+    def compile_pending(self):
+        with self.lock:
+            templates = self.pending
+            self.pending = set()
+            self.timer = None
+        with self.app.app_context():
+            for tpl in templates:
+                try:
+                    source = self.app.jinja_env.loader.get_source(self.app.jinja_env, tpl)[0]
+                    self.app.jinja_env.compile(source, tpl) # force the compilation so the extension parse() method is executed
+                except TemplateNotFound:
+                    # handle loaders that do weird stuff :)
+                    for template in self.app.jinja_loader.list_templates():
+                        if template.endswith(tpl):
+                            self.app.jinja_env.get_template(template)
+                            break
+        if self.broker:
+            self.broker.ping()
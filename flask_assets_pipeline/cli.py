@@ -6,6 +6,7 @@ import os
 import click
 import shutil
 from .livereload import start_reloader_app, Reloader
+from .utils import compress_files
 from .builders.esbuild import EsbuildBuilder
 from .builders.templates import TemplateBuilder
 from .builders.tailwind import TailwindBuilder
@@ -32,7 +33,7 @@ def dev(watch_path, watch_app, livereload, build_only):
 
     reloader = None
     if livereload:
-        reloader = Reloader()
+        reloader = Reloader(poll_interval=state.livereload_poll_interval)
         click.echo(f"Starting with livereload enabled on port {state.livereload_port}")
         for path in watch_path:
             reloader.observe(path)
@@ -81,6 +82,7 @@ def build():
     for builder in state.instance.load_builders():
         builder.build(mapping, ignore_assets)
 
+    assets = {}
     if state.assets_folder != current_app.static_folder:
         assets = state.instance.copy_assets_to_static(ignore_files=ignore_assets)
         for src, dest in assets.items():
@@ -88,8 +90,18 @@ def build():
                 dest = [dest, {"map_as": src}]
             mapping[src] = [dest]
 
+    if state.precompress:
+        click.echo("Compressing assets")
+        if os.path.exists(state.output_folder):
+            compress_files(state.output_folder)
+        compress_files(current_app.static_folder, assets.values())
+
     state.instance.write_mapping_file(mapping)
 
+    if state.mapping_cache_file:
+        state.instance.refresh_mapping()
+        state.instance.write_mapping_cache_file()
+
 
 @assets_cli.command()
 def extract():
@@ -110,11 +122,12 @@ def init_tailwind():
 @click.argument("paths", nargs=-1)
 def livereload(paths, port):
     """Start a livereload server for the specified paths indepentently from the dev command"""
+    state = current_app.extensions["assets"]
     if not port:
-        port = int(current_app.extensions["assets"].livereload_port)
+        port = int(state.livereload_port)
     click.echo(f"Starting with livereload enabled on port {port}")
     click.echo(f"Watching paths: {', '.join(paths)}")
-    reloader = Reloader()
+    reloader = Reloader(poll_interval=state.livereload_poll_interval)
     for path in paths:
         reloader.observe(path)
     reloader.observer.start()
@@ -1,5 +1,4 @@
 from jinja2.ext import Extension
-from jinja2.lexer import count_newlines
 from jinja2.lexer import Token
 from jinja2.exceptions import TemplateSyntaxError
 from jinja2.compiler import CodeGenerator as BaseCodeGenerator
@@ -7,6 +6,8 @@ from jinja2 import nodes
 from flask import current_app
 import re
 import os
+import bisect
+import hashlib
 
 
 # We want our asset_tags directive to print tags once all code has been executed,
@@ -26,6 +27,8 @@ import os
 
 def configure_environment(app, asset_tags=True, inline_assets=False):
     if asset_tags:
+        # avoids looking up the extension through current_app on each render
+        app.jinja_env.assets_instance = app.extensions["assets"].instance
         app.jinja_env.concat = env_concat
         app.jinja_env.code_generator_class = CodeGenerator
         app.jinja_env.add_extension(AssetTagsExtension)
@@ -36,7 +39,9 @@ def configure_environment(app, asset_tags=True, inline_assets=False):
 
 
 def env_concat(items):
-    return "".join(map(str, list(items)))
+    # the generator must be fully consumed before converting items (and thus evaluating AssetTagsStr)
+    items = list(items)
+    return "".join([item if type(item) is str else str(item) for item in items])
 
 
 class CodeGenerator(BaseCodeGenerator):
@@ -53,8 +58,11 @@ class CodeGenerator(BaseCodeGenerator):
 
 
 class AssetTagsStr:
+    def __init__(self, instance=None):
+        self.instance = instance
+
     def __str__(self):
-        return current_app.extensions["assets"].instance.head()
+        return (self.instance or current_app.extensions["assets"].instance).head()
 
 
 class AssetTagsExtension(Extension):
@@ -69,75 +77,113 @@ class AssetTagsExtension(Extension):
 
     @property
     def default_asset_tags(self):
-        return AssetTagsStr()
+        return AssetTagsStr(getattr(self.environment, "assets_instance", None))
     
     def asset_tags(self, filename):
-        return current_app.extensions["assets"].instance.tags(filename)
+        instance = getattr(self.environment, "assets_instance", None) or current_app.extensions["assets"].instance
+        return instance.tags(filename)
 
 
 class InlineAssetExtension(Extension):
     def __init__(self, environment):
         super().__init__(environment)
-        if not hasattr(self, "open_tag_re"):
-            self.open_tag_re = re.compile(r'<\s*%s\s+bundle(="([^"]+)")?\s*>' % self.tags[0])
-        if not hasattr(self, "close_tag_re"):
-            self.close_tag_re = re.compile(r"</\s*%s\s*>" % self.tags[0])
+        self.compile_tag_pattern()
+        self.written_assets = {}
+
+    @classmethod
+    def compile_tag_pattern(cls):
+        # compiled once per extension class rather than for each environment
+        # (checking the class dict so that subclasses with different tags get their own pattern)
+        if "tag_re" in cls.__dict__:
+            return
+        open_tag_re = getattr(cls, "open_tag_re", None)
+        close_tag_re = getattr(cls, "close_tag_re", None)
+        tag = re.escape(cls.tags[0])
+        cls.tag_re = re.compile(
+            r"(?P<open>%s)|(?P<close>%s)"
+            % (
+                open_tag_re.pattern if open_tag_re else r'<\s*%s\s+bundle(="(?P<bundle>[^"]+)")?\s*>' % tag,
+                close_tag_re.pattern if close_tag_re else r"</\s*%s\s*>" % tag,
+            )
+        )
+        # custom open tag patterns may not require the bundle attribute
+        cls.tag_prefilter = None if open_tag_re else "bundle"
+
+    def get_bundle(self, open_match):
+        open_tag_re = getattr(self, "open_tag_re", None)
+        if not open_tag_re:
+            return open_match.group("bundle")
+        try:
+            return open_tag_re.match(open_match.group("open")).group(2)
+        except IndexError:
+            return None
 
     def filter_stream(self, stream):
-        out = []
+        basename = None
+        blocks = 0
         for token in stream:
-            if token.type != "data":
-                out.append(token)
-                continue
-
-            lineno = token.lineno
-
-            open_match = self.open_tag_re.search(token.value)
-            if open_match is None:
-                out.append(token)
+            # cheap substring check to skip most data tokens, opening tags always contain the bundle attribute
+            if token.type != "data" or (self.tag_prefilter and self.tag_prefilter not in token.value):
+                yield token
                 continue
 
-            try:
-                bundle = open_match.group(2)
-            except IndexError:
-                bundle = None
-
-            filename = f"{os.path.splitext(stream.name)[0]}.{self.fileext}"
-
-            if open_match.start() > 0:
-                preval = token.value[: open_match.start()]
-                out.append(Token(lineno, "data", preval))
-                lineno += count_newlines(preval)
-
-            end_match = self.close_tag_re.search(token.value[open_match.end():])
-            if not end_match:
-                raise TemplateSyntaxError(
-                    f"unclosed {self.tags[0]} tag",
-                    token.lineno,
-                    stream.name,
-                    stream.filename,
-                )
-
-            content = token.value[open_match.end() : open_match.end() + end_match.start()]
-            block_end_lineno = lineno + count_newlines(content)
-            out.extend(
-                [
+            value = token.value
+            pos = 0
+            open_match = None
+            newlines = None
+
+            # scan open and close tags in a single pass, only slicing the value at block boundaries
+            for match in self.tag_re.finditer(value):
+                if open_match is None:
+                    if match.group("open"):
+                        open_match = match
+                    continue
+                if not match.group("close"):
+                    continue
+
+                if basename is None:
+                    basename = os.path.splitext(stream.name)[0]
+                # each block of the template is extracted to its own file
+                blocks += 1
+                filename = f"{basename}.{self.fileext}" if blocks == 1 else f"{basename}-{blocks}.{self.fileext}"
+                if newlines is None:
+                    # offsets of all line endings (data tokens use normalized newlines), line numbers are then
+                    # found using a binary search instead of counting newlines in each slice
+                    newline_char = self.environment.newline_sequence[-1]
+                    newlines = [m.start() for m in re.finditer(re.escape(newline_char), value)]
+
+                if open_match.start() > pos:
+                    yield Token(token.lineno + bisect.bisect_left(newlines, pos), "data", value[pos : open_match.start()])
+
+                lineno = token.lineno + bisect.bisect_left(newlines, open_match.start())
+                block_end_lineno = token.lineno + bisect.bisect_left(newlines, match.start())
+                content = value[open_match.end() : match.start()]
+                yield from (
                     Token(lineno, "block_begin", None),
                     Token(lineno, "name", self.tags[0]),
-                    Token(lineno, "const", bundle),
+                    Token(lineno, "const", self.get_bundle(open_match)),
                     Token(lineno, "const", filename),
                     Token(lineno, "block_end", None),
                     Token(lineno, "data", content),
                     Token(block_end_lineno, "block_begin", None),
                     Token(block_end_lineno, "name", f"end{self.tags[0]}"),
                     Token(block_end_lineno, "block_end", None),
-                ]
-            )
+                )
+                pos = match.end()
+                open_match = None
 
-            if open_match.end() + end_match.end() < len(token.value):
-                out.append(Token(block_end_lineno, "data", token.value[open_match.end() + end_match.end() :]))
+            if open_match is not None:
+                raise TemplateSyntaxError(
+                    f"unclosed {self.tags[0]} tag",
+                    token.lineno,
+                    stream.name,
+                    stream.filename,
+                )
 
-        return out
+            if not pos:
+                yield token
+            elif pos < len(value):
+                yield Token(token.lineno + bisect.bisect_left(newlines, pos), "data", value[pos:])
 
     def parse(self, parser):
         lineno = next(parser.stream).lineno
@@ -147,7 +193,7 @@ class InlineAssetExtension(Extension):
         content = body[0].nodes[0].data
         state = self.environment.app.extensions["assets"]
         if bundle and bundle in state.bundles:
-            state.bundles[bundle].append(filename)
+            state.instance.bundle([filename], bundle, append=True)
         elif bundle and bundle.startswith("@"):
             state.instance.bundle([filename], bundle, include=not state.include_inline_on_demand)
         else:
@@ -155,9 +201,13 @@ class InlineAssetExtension(Extension):
             state.instance.bundle([filename], include=not state.include_inline_on_demand)
         if getattr(self.environment, "write_inline_assets", None):
             pathname = os.path.join(state.assets_folder, filename)
-            os.makedirs(os.path.dirname(pathname), exist_ok=True)
-            with open(pathname, "w") as f:
-                f.write(content)
+            # rewriting unchanged content would trigger a rebuild from the esbuild watcher
+            content_hash = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+            if self.written_assets.get(pathname) != content_hash or not os.path.exists(pathname):
+                os.makedirs(os.path.dirname(pathname), exist_ok=True)
+                with open(pathname, "w") as f:
+                    f.write(content)
+                self.written_assets[pathname] = content_hash
         return nodes.Output(
             [
                 nodes.Call(
@@ -1,8 +1,10 @@
 from flask import Flask
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 from werkzeug.serving import run_simple
 import queue
+import threading
 import os
 import logging
 
@@ -26,36 +28,77 @@ class ReloadHandler(FileSystemEventHandler):
     def __init__(self, broker, filter=None):
         self.broker = broker
         self.filter = filter
+        self.mtimes = {}
 
     def on_modified(self, event):
-        if not self.filter or self.filter(event):
-            self.broker.ping()
+        if event.is_directory:
+            # modified files also trigger an event on their parent directory
+            return
+        if self.filter and not self.filter(event):
+            return
+        try:
+            st = os.stat(event.src_path)
+        except OSError:
+            return
+        sig = (st.st_mtime_ns, st.st_size)
+        if self.mtimes.get(event.src_path) == sig:
+            # the content did not change (eg. chmod)
+            return
+        self.mtimes[event.src_path] = sig
+        self.broker.ping()
 
 
 class Reloader:
-    def __init__(self, observer=None):
+    debounce_delay = 0.05
+
+    def __init__(self, observer=None, poll_interval=None):
         if not observer:
-            observer = Observer()
+            observer = PollingObserver(timeout=poll_interval) if poll_interval else Observer()
         self.observer = observer
-        self.subscribers = []
+        self.subscribers = set()
+        self.handlers = {}
+        self.timer = None
+        self.lock = threading.Lock()
 
     def observe(self, path, filter=None, recursive=True):
-        self.observer.schedule(ReloadHandler(self, filter), path, recursive=recursive)
+        # paths using the same filter share their handler
+        handler = self.handlers.get(filter)
+        if handler is None:
+            handler = self.handlers[filter] = ReloadHandler(self, filter)
+        self.observer.schedule(handler, path, recursive=recursive)
 
     def subscribe(self):
         q = queue.Queue(maxsize=5)
-        self.subscribers.append(q)
+        with self.lock:
+            self.subscribers.add(q)
         return q
 
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+
     def ping(self):
+        # file changes come in bursts (atomic saves, multiple build outputs), only notify once they are done
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.debounce_delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
         print("Reloading")
-        subscribers = self.subscribers
         msg = "event: change\ndata: ok\n\n"
-        for i in reversed(range(len(subscribers))):
-            try:
-                subscribers[i].put_nowait(msg)
-            except queue.Full:
-                del subscribers[i]
+        with self.lock:
+            self.timer = None
+            # disconnected clients unsubscribe themselves, this only drops stalled ones
+            dead = []
+            for sub in self.subscribers:
+                try:
+                    sub.put_nowait(msg)
+                except queue.Full:
+                    dead.append(sub)
+            self.subscribers.difference_update(dead)
 
 
 def create_reloader_app(reloader):
@@ -65,8 +108,18 @@ def create_reloader_app(reloader):
     def index():
         def stream():
             sub = reloader.subscribe()
-            while True:
-                yield sub.get()
+            try:
+                while True:
+                    # send all pending messages at once
+                    batch = [sub.get()]
+                    try:
+                        while True:
+                            batch.append(sub.get_nowait())
+                    except queue.Empty:
+                        pass
+                    yield "".join(batch)
+            finally:
+                reloader.unsubscribe(sub)
 
         return stream(), {"Content-Type": "text/event-stream", "Access-Control-Allow-Origin": "*"}
 
@@ -1,25 +1,69 @@
 import os
+import sys
+import errno
 import shutil
 import hashlib
 import re
+import json
+import gzip
+import mmap
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_ABS_URL_RE = re.compile(r"([a-z]+:)?//")
+
+
+def copy_assets(src, dest, stamp=True, ignore_files=None, logger=None, hash_cache_file=None):
+    entries = {}
+    for entry in iter_files(src):
+        relpath = os.path.relpath(entry.path, src)
+        if ignore_files and relpath in ignore_files:
+            continue
+        entries[relpath] = entry
+
+    # hashing and copying is mostly io bound and every file is independent
+    with ThreadPoolExecutor() as executor:
+        if stamp:
+            files = {}
+            prev_hash_cache = read_hash_cache_file(hash_cache_file) if hash_cache_file else {}
+            hash_cache = {}
+            hashes = executor.map(
+                lambda relpath: hash_dir_entry(entries[relpath], prev_hash_cache.get(relpath), hash_cache, relpath),
+                entries,
+            )
+            for relpath, hash in zip(entries, hashes):
+                base, ext = os.path.splitext(relpath)
+                files[relpath] = f"{base}-{hash[:10]}{ext}"
+            if hash_cache_file:
+                write_hash_cache_file(hash_cache_file, hash_cache)
+            # the stamped name identifies the content, files already copied by a previous build are up to date
+            to_copy = {s: d for s, d in files.items() if not is_same_size(entries[s], os.path.join(dest, d))}
+        else:
+            files = to_copy = {relpath: relpath for relpath in entries}
+        for future in [executor.submit(copy_files, {s: d}, src, dest, logger) for s, d in to_copy.items()]:
+            future.result()
 
-def copy_assets(src, dest, stamp=True, ignore_files=None, logger=None):
-    files = {}
-    for root, _, filenames in os.walk(src):
-        for filename in filenames:
-            srcfile = os.path.join(root, filename)
-            relpath = os.path.relpath(srcfile, src)
-            if ignore_files and relpath in ignore_files:
-                continue
-            destfile = relpath
-            if stamp:
-                hash = hash_file(srcfile)[:10]
-                base, ext = os.path.splitext(destfile)
-                destfile = f"{base}-{hash}{ext}"
-            files[relpath] = destfile
-
-    copy_files(files, source_folder=src, output_folder=dest, logger=logger)
     return files
 
 
@@ -48,20 +92,185 @@ def copy_files(files, source_folder=None, output_folder=None, logger=None):
         if os.path.isdir(src):
             shutil.copytree(src, target)
         else:
-            if not os.path.exists(os.path.dirname(target)):
-                os.makedirs(os.path.dirname(target))
-            shutil.copyfile(src, target)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # copy to a temporary file first so that an interrupted copy never leaves a truncated target
+            tmp = target + ".tmp"
+            clone_file(src, tmp)
+            os.replace(tmp, target)
+
+
+# linux ioctl to share file extents between files (btrfs, xfs...)
+FICLONE = 0x40049409
+_reflink_supported = fcntl is not None and sys.platform.startswith("linux")
+
+
+def is_same_size(entry, filename):
+    try:
+        return os.stat(filename).st_size == entry.stat().st_size
+    except OSError:
+        return False
+
+
+def clone_file(src, dest):
+    """Copies a file using a reflink when the filesystem supports it"""
+    global _reflink_supported
+    if _reflink_supported:
+        try:
+            with open(src, "rb") as s, open(dest, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return
+        except OSError as e:
+            if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS):
+                # do not try again on a filesystem without reflink support
+                _reflink_supported = False
+            elif e.errno != errno.EXDEV:
+                raise
+    shutil.copyfile(src, dest)
+
+
+COMPRESSIBLE_EXTS = (".js", ".css", ".svg", ".json", ".html", ".map")
+
+
+def compress_files(folder, filenames=None, exts=COMPRESSIBLE_EXTS, logger=None):
+    """Writes .gz (and .br if brotli is installed) versions of files next to them.
+    Compresses all files from folder unless a list of filenames relative to it is provided.
+    """
+    if filenames is None:
+        filenames = [os.path.relpath(os.path.join(root, f), folder) for root, _, files in os.walk(folder) for f in files]
+    for filename in filenames:
+        if not filename.endswith(exts):
+            continue
+        filename = os.path.join(folder, filename)
+        # outputs from previous builds stay in the folder, only compress new or modified files
+        mtime = os.stat(filename).st_mtime_ns
+        if is_newer(filename + ".gz", mtime) and (not brotli or is_newer(filename + ".br", mtime)):
+            continue
+        if logger:
+            logger.debug(f"Compressing '{filename}'")
+        with open(filename, "rb") as f:
+            data = f.read()
+        # mtime=0 keeps the output reproducible
+        write_file_atomic(filename + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli:
+            write_file_atomic(filename + ".br", brotli.compress(data, quality=11))
+
+
+def is_newer(filename, mtime_ns):
+    try:
+        return os.stat(filename).st_mtime_ns >= mtime_ns
+    except OSError:
+        return False
+
+
+def write_file_atomic(filename, data):
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, filename)
+
+
+def iter_files(path):
+    """Recursively yields os.DirEntry objects for files under path"""
+    try:
+        it = os.scandir(path)
+    except OSError:
+        # like os.walk(), ignore missing or unreadable directories
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir():
+                # like os.walk(), do not follow symlinked directories
+                if not entry.is_symlink():
+                    yield from iter_files(entry.path)
+            else:
+                yield entry
+
+
+def hash_dir_entry(entry, cached=None, cache=None, key=None):
+    # the stat comes with the directory listing, use it to avoid rehashing unchanged files
+    st = entry.stat()
+    sig = [st.st_mtime_ns, st.st_size]
+    if cached and cached[:2] == sig:
+        hash = cached[2]
+    else:
+        hash = _cached_hash_file(entry.path, st.st_size, st.st_mtime_ns)
+    if cache is not None:
+        cache[key] = sig + [hash]
+    return hash
+
+
+def read_hash_cache_file(filename):
+    try:
+        return json_load_file(filename)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_hash_cache_file(filename, cache):
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(json_dumps(cache).encode("utf-8"))
+    os.replace(tmp, filename)
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_hash_file(filename, size, mtime_ns):
+    return hash_file(filename)
 
 
 def hash_file(filename):
-    h = hashlib.sha256()
-    b = bytearray(128 * 1024)
-    mv = memoryview(b)
+    # hashes are only used for cache busting, blake2b is faster than sha256
     with open(filename, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "blake2b").hexdigest()
+        h = hashlib.blake2b()
+        b = bytearray(128 * 1024)
+        mv = memoryview(b)
         while n := f.readinto(mv):
             h.update(mv[:n])
-    return h.hexdigest()
+        return h.hexdigest()
 
 
 def is_abs_url(path):
-    return re.match("([a-z]+:)?//", path) if isinstance(path, str) else False
+    return isinstance(path, str) and _ABS_URL_RE.match(path) is not None
+
+
+def normalize_mapping(mapping):
+    """Converts all urls of a mapping to (url, meta) tuples"""
+    return {
+        src: [tuple(url) if isinstance(url, (tuple, list)) else (url, {}) for url in urls]
+        for src, urls in mapping.items()
+    }
+
+
+def json_loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_load_file(filename):
+    with open(filename, "rb") as f:
+        if not orjson or not os.fstat(f.fileno()).st_size:
+            return json_loads(f.read())
+        # orjson can parse the mapped file directly, without reading it in a bytes object first
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buf:
+            return orjson.loads(buf)
+
+
+def json_dumps(obj):
+    if orjson:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def msgpack_loads(data):
+    if not msgpack:
+        raise Exception("msgpack must be installed to use a .msgpack mapping file")
+    return msgpack.unpackb(data, raw=False)
+
+
+def msgpack_dumps(obj):
+    if not msgpack:
+        raise Exception("msgpack must be installed to use a .msgpack mapping file")
+    return msgpack.packb(obj, use_bin_type=True)